@@ -0,0 +1,109 @@
+#! /usr/bin/env python3
+
+# Wall time of evaluating the COBIDAS guidelines on a synthetic BIDS dataset with 1 or more worker processes.
+# Run from the repository root with: python -m benchmarks.parallel_evaluate
+#
+# When there are fewer CPUs than workers, the workers take turns and the measured time cannot drop,
+# so the time on enough CPUs is also projected from the CPU time each side actually used:
+#   CPU time of the parent process + CPU time of all workers / number of workers
+
+import argparse
+import json
+import os
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from bids import BIDSLayout
+from guidelines import parallel
+from guidelines.guidelines import cobidas
+
+SIDECARS = {
+    ('anat', 'T1w'): {'Manufacturer': 'SIEMENS', 'EchoTime': 0.00226, 'RepetitionTime': 2.3, 'FlipAngle': 8},
+    ('func', 'bold'): {'Manufacturer': 'SIEMENS', 'EchoTime': 0.03, 'RepetitionTime': 2.0, 'FlipAngle': 77},
+    ('dwi', 'dwi'): {'Manufacturer': 'SIEMENS', 'EchoTime': 0.089, 'RepetitionTime': 3.23, 'FlipAngle': 90},
+    ('perf', 'asl'): {'Manufacturer': 'SIEMENS', 'ArterialSpinLabelingType': 'PCASL', 'LabelingDuration': 1.8},
+}
+
+RUNS = 6
+
+def make_dataset(root, n_subjects):
+    """
+    Write an empty-image BIDS dataset with one JSON sidecar per image, as dcm2niix does.
+    """
+
+    (root / 'dataset_description.json').write_text(json.dumps({'Name': 'synthetic', 'BIDSVersion': '1.10.0'}))
+
+    count = 0
+    for subject in range(1, n_subjects + 1):
+        for (datatype, suffix), sidecar in SIDECARS.items():
+            directory = root / f'sub-{subject:04d}' / datatype
+            directory.mkdir(parents=True, exist_ok=True)
+
+            runs = RUNS if datatype == 'func' else 1
+            for run in range(1, runs + 1):
+                name = f'sub-{subject:04d}'
+                if datatype == 'func':
+                    name += f'_task-rest_run-{run:02d}'
+                name += f'_{suffix}'
+
+                (directory / f'{name}.nii.gz').touch()
+                if datatype == 'dwi':
+                    (directory / f'{name}.bval').touch()
+                    (directory / f'{name}.bvec').touch()
+
+                metadata = dict(sidecar, AcquisitionTime=f'{8 + count // 3600 % 12:02d}:{count // 60 % 60:02d}:{count % 60:02d}')
+                (directory / f'{name}.json').write_text(json.dumps(metadata))
+                count += 1
+
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel guideline evaluation benchmark')
+    parser.add_argument(
+        '-s', '--subjects', metavar='N', type=int, default=500,
+        help='Number of synthetic subjects, with 9 images each. Default is 500.',
+    )
+    parser.add_argument(
+        '-j', '--jobs', metavar='N', type=int, nargs='+', default=[1, 2, 4],
+        help='Numbers of worker processes to time. Default is 1 2 4.',
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        n_images = make_dataset(Path(directory), args.subjects)
+
+        start = time.perf_counter()
+        layout = BIDSLayout(directory, derivatives=False)
+        print(f"images:\t\t{n_images} ({os.cpu_count()} CPUs)")
+        print(f"BIDSLayout:\t{time.perf_counter() - start:.2f} s")
+
+        baseline = None
+        for jobs in args.jobs:
+            children_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+            cpu_start = time.process_time()
+            start = time.perf_counter()
+            results, errors = parallel.evaluate(cobidas, layout, jobs=jobs)
+            elapsed = time.perf_counter() - start
+            parent_cpu = time.process_time() - cpu_start
+            children_end = resource.getrusage(resource.RUSAGE_CHILDREN)
+            children_cpu = (
+                children_end.ru_utime + children_end.ru_stime - children_start.ru_utime - children_start.ru_stime
+            )
+
+            if baseline is None:
+                baseline = (results, errors, elapsed)
+            elif (results, errors) != baseline[:2]:
+                raise RuntimeError(f"Results with {jobs} jobs differ from a run with {args.jobs[0]} jobs.")
+
+            line = f"evaluate -j {jobs}:\t{elapsed:.2f} s\t({baseline[2] / elapsed:.1f}x)"
+
+            if jobs > 1 and jobs > os.cpu_count():
+                projected = parent_cpu + children_cpu / jobs
+                line += f"\tprojected on {jobs} CPUs: {projected:.2f} s ({baseline[2] / projected:.1f}x)"
+
+            print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#! /usr/bin/env python3
+
+# Per-file memory of the metadata snapshot on a synthetic 100k-file dataset, both when
+# every run shares its sidecar and when each file has its own (as dcm2niix writes them).
+# Run from the repository root with: python -m benchmarks.snapshot_memory
+
+import argparse
+import gc
+import json
+import tracemalloc
+
+from guidelines.snapshot import metadata_snapshot
+
+# a typical acquisition: one sidecar per datatype/suffix, shared by every subject and run
+SIDECARS = {
+    ('anat', 'T1w'): {
+        'Manufacturer': 'SIEMENS',
+        'ManufacturersModelName': 'Prisma_fit',
+        'MagneticFieldStrength': 3,
+        'EchoTime': 0.00226,
+        'RepetitionTime': 2.3,
+        'FlipAngle': 8,
+        'SoftwareVersions': 'syngo MR E11',
+    },
+    ('func', 'bold'): {
+        'Manufacturer': 'SIEMENS',
+        'ManufacturersModelName': 'Prisma_fit',
+        'MagneticFieldStrength': 3,
+        'EchoTime': 0.03,
+        'RepetitionTime': 2.0,
+        'FlipAngle': 77,
+        'SoftwareVersions': 'syngo MR E11',
+        'TaskName': 'rest',
+        'SliceTiming': [round(0.0625 * i, 4) for i in range(32)],
+    },
+    ('dwi', 'dwi'): {
+        'Manufacturer': 'SIEMENS',
+        'ManufacturersModelName': 'Prisma_fit',
+        'MagneticFieldStrength': 3,
+        'EchoTime': 0.089,
+        'RepetitionTime': 3.23,
+        'FlipAngle': 90,
+        'SoftwareVersions': 'syngo MR E11',
+    },
+    ('fmap', 'phasediff'): {
+        'Manufacturer': 'SIEMENS',
+        'ManufacturersModelName': 'Prisma_fit',
+        'MagneticFieldStrength': 3,
+        'EchoTime1': 0.00492,
+        'EchoTime2': 0.00738,
+        'RepetitionTime': 0.4,
+        'FlipAngle': 60,
+    },
+}
+
+RUNS = 22
+
+# benchmark scenarios: whether each sidecar holds a per-file value
+SCENARIOS = {
+    'shared sidecars': False,
+    'per-file sidecars': True,
+}
+
+def synthetic_files(n_files, per_file=False):
+    """
+    Yield (path, entities, metadata) tuples the way BIDSLayout returns them, one fresh dict per file.
+    With per_file, every sidecar gets its own AcquisitionTime, so no two files share metadata.
+    """
+
+    count = 0
+    subject = 0
+    while True:
+        subject += 1
+        for (datatype, suffix), sidecar in SIDECARS.items():
+            runs = RUNS if datatype == 'func' else 1
+            for run in range(1, runs + 1):
+                if count == n_files:
+                    return
+
+                entities = {
+                    'subject': f'{subject:05d}',
+                    'session': '01',
+                    'datatype': datatype,
+                    'suffix': suffix,
+                    'extension': '.nii.gz',
+                }
+                name = f'sub-{subject:05d}_ses-01'
+                if datatype == 'func':
+                    entities['task'] = 'rest'
+                    entities['run'] = run
+                    name += f'_task-rest_run-{run:02d}'
+                name += f'_{suffix}.nii.gz'
+
+                path = f'/data/ds999999/sub-{subject:05d}/ses-01/{datatype}/{name}'
+
+                # decoded JSON never shares strings or containers between files
+                metadata = json.loads(json.dumps(sidecar))
+                if per_file:
+                    seconds = 8 * 3600 + count * 0.5
+                    metadata['AcquisitionTime'] = (
+                        f'{int(seconds // 3600) % 24:02d}:{int(seconds // 60) % 60:02d}:{seconds % 60:09.6f}'
+                    )
+
+                yield path, dict(entities), metadata
+                count += 1
+
+def measure(build, n_files, per_file):
+    """
+    Return the bytes held by the result of build(files) and the result itself.
+    """
+
+    gc.collect()
+    tracemalloc.start()
+    result = build(synthetic_files(n_files, per_file))
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return current, result
+
+def build_dicts(files):
+    return [(path, entities, metadata) for path, entities, metadata in files]
+
+def build_snapshot(files):
+    snapshot = metadata_snapshot()
+    for path, entities, metadata in files:
+        snapshot.add(path, entities, metadata)
+
+    return snapshot
+
+def main():
+    parser = argparse.ArgumentParser(description='Metadata snapshot memory benchmark')
+    parser.add_argument(
+        '-n', '--files', metavar='N', type=int, default=100_000,
+        help='Number of synthetic image files. Default is 100000.',
+    )
+    args = parser.parse_args()
+
+    for scenario, per_file in SCENARIOS.items():
+        dicts_bytes, dicts = measure(build_dicts, args.files, per_file)
+        del dicts
+        snapshot_bytes, snapshot = measure(build_snapshot, args.files, per_file)
+
+        print(f"{scenario}:")
+        print(f"  files:\t\t{len(snapshot)}")
+        print(f"  distinct sidecars:\t{len(snapshot.metadata_table)}")
+        print(f"  per-file dicts:\t{dicts_bytes / args.files:.0f} bytes/file")
+        print(f"  snapshot:\t\t{snapshot_bytes / args.files:.0f} bytes/file")
+        print(f"  reduction:\t\t{dicts_bytes / snapshot_bytes:.1f}x")
+        del snapshot
+
+if __name__ == "__main__":
+    main()
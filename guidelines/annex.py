@@ -0,0 +1,80 @@
+# helpers for scanning DataLad/git-annex datasets without retrieving content
+
+import os
+from pathlib import Path
+
+# file status values
+PRESENT = 'present'
+ANNEXED = 'annexed'
+MISSING = 'missing'
+
+# every annexed file is a symlink into the annex object store
+ANNEX_OBJECTS = '.git/annex/objects/'
+
+def annex_key(link_target):
+    """
+    Return the git-annex key from a symlink target, or None if the target
+    does not point into the annex object store.
+    """
+
+    if ANNEX_OBJECTS not in link_target.replace(os.sep, '/'):
+        return None
+
+    return os.path.basename(link_target)
+
+def scan_directory(directory):
+    """
+    Classify every entry of a single directory in one pass.
+    Returns a dict mapping file names to PRESENT, ANNEXED, or (broken, non-annex links) MISSING.
+    Only directory entries and link targets are read, never file content.
+    """
+
+    statuses = {}
+
+    try:
+        entries = list(os.scandir(directory))
+    except (FileNotFoundError, NotADirectoryError):
+        return statuses
+
+    for entry in entries:
+        if not entry.is_symlink():
+            statuses[entry.name] = PRESENT
+            continue
+
+        target = os.readlink(entry.path)
+        object_path = os.path.join(directory, target)
+
+        # stat the object path only, a dangling link means the content was never retrieved
+        if os.path.exists(object_path):
+            statuses[entry.name] = PRESENT
+        elif annex_key(target) is not None:
+            statuses[entry.name] = ANNEXED
+        else:
+            statuses[entry.name] = MISSING
+
+    return statuses
+
+class annex_index:
+    def __init__(self):
+        # directory listings, scanned once on first use
+        self.directories = {}
+
+    def status(self, path):
+        """
+        Return PRESENT, ANNEXED, or MISSING for a path, scanning its directory in bulk on first use.
+        """
+
+        path = Path(path)
+        directory = str(path.parent)
+
+        if directory not in self.directories:
+            self.directories[directory] = scan_directory(directory)
+
+        return self.directories[directory].get(path.name, MISSING)
+
+    def available(self, path):
+        """
+        True if the file exists in the dataset, whether or not its content has been retrieved.
+        """
+
+        return self.status(path) != MISSING
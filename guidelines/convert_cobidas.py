@@ -1,80 +1,105 @@
+import argparse
+import hashlib
 import pandas
 import re
 from pathlib import Path
 
-guidelines_file = Path(__file__).parent / 'sources/COBIDAS_AppendixD_clean_OSF.xlsx'
-df = pandas.read_excel(guidelines_file, skiprows=[r for r in range(13)])
-table_df = df[[
-    'Reference',
-    'Table.1',
-    'Aspect1',
-    'Aspect2',
-    'Aspect3',
-    'Aspect4',
-    'Detail to specify if used/applicable',
-]]
-
-# convert table to a YAML structure
-table_dict = table_df.to_dict(orient='records')
-
-output_dict = {'guidelines': []}
-
-re_replacements = {
-    r' \u00ad': '-',
-    r'\u00ad ': '-',
-    r'\u00ad': '-',
-    r'\u00d7': 'x',
-    r'\u037e': ';',
-    r' \u2013': '-',
-    r'\u2013 ': '-',
-    r'\u2013': '-',
-    r' \u2014': '-',
-    r'\u2014 ': '-',
-    r'\u2014': '-',
-    r'\u2018': '\'',
-    r'\u2019': '\'',
-    r'\u201c': '\\"',
-    r'\u201d': '\\"',
-    r' \u2212': '-',
-    r'\u2212 ': '-',
-    r'\u2212': '-',
+# source spreadsheets, one per guidelines YAML file
+# (each guideline row is written as its index, an info line joined from the info columns, and its text)
+SOURCES = {
+    'COBIDAS': {
+        'spreadsheet': 'sources/COBIDAS_AppendixD_clean_OSF.xlsx',
+        'skiprows': 13,
+        'index': 'Reference',
+        'info': ['Table.1', 'Aspect1', 'Aspect2', 'Aspect3', 'Aspect4'],
+        'text': 'Detail to specify if used/applicable',
+        'output': 'cobidas.yaml',
+    },
 }
 
-for row in table_dict:
-    # replace characters
-    row['Detail to specify if used/applicable'] = row['Detail to specify if used/applicable'].replace('"', '\\"')
-    for pattern, replacement in re_replacements.items():
-        row['Detail to specify if used/applicable'] = re.sub(pattern, replacement, row['Detail to specify if used/applicable'])
-    row['Detail to specify if used/applicable'] = row['Detail to specify if used/applicable'].replace('--', '-')
-    row['Detail to specify if used/applicable'] = row['Detail to specify if used/applicable'].replace(' -', '-')
-
-    info_list = [ row['Table.1'] , row['Aspect1'] ]
-
-    if not pandas.isna(row['Aspect2']):
-        info_list.append(row['Aspect2'])
-    if not pandas.isna(row['Aspect3']):
-        info_list.append(row['Aspect3'])
-    if not pandas.isna(row['Aspect4']):
-        info_list.append(row['Aspect4'])
-
-    info = ' | '.join(info_list)
-    for pattern, replacement in re_replacements.items():
-        info = re.sub(pattern, replacement, info)
-
-    temp_dict = {}
-    temp_dict['index'] = row['Reference']
-    temp_dict['info'] = info
-    temp_dict['text'] = '"' + row['Detail to specify if used/applicable'] + '"'
-
-    output_dict['guidelines'].append(temp_dict)
-
-# write to YAML file
-output_file = Path(__file__).parent / 'cobidas.yaml'
-with open(output_file, 'w') as f:
-    f.write('guidelines:\n')
-    for guideline in output_dict['guidelines']:
-        f.write(f"  {guideline['index']}:\n")
-        f.write(f"      info: {guideline['info']}\n")
-        f.write(f"      text: {guideline['text']}\n")
-
-print(f"Converted COBIDAS guidelines to: {output_file}")
+# soft hyphens, en/em dashes and minus signs become '-', swallowing one neighbouring space
+re_dashes = re.compile(' [\u00ad\u2013\u2014\u2212]|[\u00ad\u2013\u2014\u2212] ?')
+
+# all other characters are replaced in a single pass
+translation_table = str.maketrans({
+    '\u00d7': 'x',
+    '\u037e': ';',
+    '\u2018': '\'',
+    '\u2019': '\'',
+    '\u201c': '\\"',
+    '\u201d': '\\"',
+})
+
+def normalize(column):
+    """
+    Replace typographic characters in a column of strings.
+    """
+
+    return column.str.replace(re_dashes, '-', regex=True).str.translate(translation_table)
+
+def convert(source):
+    """
+    Convert one source spreadsheet to the text of its guidelines YAML file.
+    """
+
+    guidelines_file = Path(__file__).parent / source['spreadsheet']
+    df = pandas.read_excel(guidelines_file, skiprows=[r for r in range(source['skiprows'])])
+
+    # escape double quotes, as the text is written inside them
+    text = df[source['text']].str.replace('"', '\\"', regex=False)
+    text = normalize(text)
+    text = text.str.replace('--', '-', regex=False).str.replace(' -', '-', regex=False)
+
+    # the first two info columns are always filled in, the remaining ones are optional
+    first, second, *optional = source['info']
+    info = df[first] + ' | ' + df[second]
+    for column in optional:
+        info = info + (' | ' + df[column]).fillna('')
+    info = normalize(info)
+
+    lines = ['guidelines:\n']
+    for index, guideline_info, guideline_text in zip(df[source['index']], info, text):
+        lines.append(f"  {index}:\n")
+        lines.append(f"      info: {guideline_info}\n")
+        lines.append(f"      text: \"{guideline_text}\"\n")
+
+    return ''.join(lines)
+
+def write_if_changed(output_file, content):
+    """
+    Write content to output_file only when its hash differs from the file already there,
+    so unchanged regenerations leave the file (and its modification time) alone.
+    Returns True if the file was written.
+    """
+
+    content = content.encode('utf-8')
+
+    if output_file.exists():
+        if hashlib.sha256(output_file.read_bytes()).digest() == hashlib.sha256(content).digest():
+            return False
+
+    output_file.write_bytes(content)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert guideline source spreadsheets to YAML')
+    parser.add_argument(
+        'guidelines', metavar='GUIDELINE', type=str, nargs='*',
+        help='Guidelines to convert, e.g. COBIDAS. Default is all guidelines with a source spreadsheet.',
+    )
+    args = parser.parse_args()
+
+    for name in args.guidelines or SOURCES:
+        if name not in SOURCES:
+            raise ValueError(f"No source spreadsheet is registered for {name} guidelines yet.")
+
+        source = SOURCES[name]
+        output_file = Path(__file__).parent / source['output']
+
+        if write_if_changed(output_file, convert(source)):
+            print(f"Converted {name} guidelines to: {output_file}")
+        else:
+            print(f"{name} guidelines unchanged: {output_file}")
+
+if __name__ == "__main__":
+    main()
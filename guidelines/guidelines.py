@@ -2,21 +2,36 @@
 
 import yaml
 from bids import BIDSLayout
-from copy import deepcopy
+from guidelines.annex import annex_index
+from guidelines.snapshot import metadata_snapshot
 from pathlib import Path
 
+# the COBIDAS guidelines, loaded once per process (forked worker processes inherit them)
+cobidas_guidelines = yaml.safe_load(
+    (Path(__file__).parent / 'cobidas.yaml').read_text(encoding='utf-8')
+)['guidelines']
+
 class cobidas:
-    def __init__(self, layout: BIDSLayout):
+    def __init__(self, layout: BIDSLayout = None, snapshot: metadata_snapshot = None):
         # load in the BIDS layout
         self.layout = layout
 
-        # Load the guidelines from a YAML file
-        guidelines_content = yaml.safe_load(
-            (Path(__file__).parent / 'cobidas.yaml').read_text(encoding='utf-8')
-        )
-        self.guidelines = guidelines_content['guidelines']
+        # entities and metadata of every image, read once and shared by all checks
+        # (worker processes build the snapshot of their own chunk of the files instead)
+        if snapshot is None:
+            if layout is None:
+                raise ValueError("Either a BIDS layout or a metadata snapshot is required to check guidelines.")
+
+            snapshot = metadata_snapshot.from_layout(layout)
+        self.snapshot = snapshot
+
+        self.guidelines = cobidas_guidelines
+
+        # file presence is read from symlinks, so annexed content is never retrieved
+        self.annex = annex_index()
 
-    def _grade_success(self, tally, total):
+    @staticmethod
+    def _grade_success(tally, total):
         """
         Determine the success status based on the tally and total counts.
         Returns "level" of success.
@@ -31,7 +46,8 @@ class cobidas:
         else:
             return 'partial success'
 
-    def _measure_success(self, tally, total):
+    @staticmethod
+    def _measure_success(tally, total):
         """
         Calculate the success percentage based on the tally and total counts.
         Returns the percentage as an integer.
@@ -58,12 +74,11 @@ class cobidas:
         total = 0
 
         # logic for this guideline
-        for task in self.layout.get_tasks():
-            task_files = self.layout.get(task=task, extension='nii.gz')
-
-            for task_file in task_files:
-                metadata = task_file.get_metadata()
+        for nifti_file in self.snapshot.records:
+            metadata = nifti_file.metadata
+            entities = nifti_file.entities
 
+            if 'task' in entities:
                 total += 1
                 if 'Instructions' in metadata:
                     tally += 1
@@ -87,9 +102,9 @@ class cobidas:
         total = 0
 
         # logic for this guideline
-        for nifti_file in self.layout.get(extension='nii.gz'):
-            metadata = nifti_file.get_metadata()
-            entities = nifti_file.get_entities()
+        for nifti_file in self.snapshot.records:
+            metadata = nifti_file.metadata
+            entities = nifti_file.entities
 
             if entities['datatype'] in ['anat', 'dwi', 'fmap', 'func', 'perf']:
                 total += 1
@@ -124,9 +139,9 @@ class cobidas:
         total = 0
 
         # logic for this guideline
-        for nifti_file in self.layout.get(extension='nii.gz'):
-            metadata = nifti_file.get_metadata()
-            entities = nifti_file.get_entities()
+        for nifti_file in self.snapshot.records:
+            metadata = nifti_file.metadata
+            entities = nifti_file.entities
 
             if entities['datatype'] in ['anat', 'dwi', 'fmap', 'func', 'perf']:
                 total += 1
@@ -152,9 +167,9 @@ class cobidas:
         total = 0
 
         # logic for this guideline
-        for nifti_file in self.layout.get(extension='nii.gz'):
-            metadata = nifti_file.get_metadata()
-            entities = nifti_file.get_entities()
+        for nifti_file in self.snapshot.records:
+            metadata = nifti_file.metadata
+            entities = nifti_file.entities
 
             if entities['datatype'] in ['anat', 'dwi', 'fmap', 'func', 'perf']:
                 total += 1
@@ -180,9 +195,9 @@ class cobidas:
         total = 0
 
         # logic for this guideline
-        for nifti_file in self.layout.get(extension='nii.gz'):
-            metadata = nifti_file.get_metadata()
-            entities = nifti_file.get_entities()
+        for nifti_file in self.snapshot.records:
+            metadata = nifti_file.metadata
+            entities = nifti_file.entities
 
             if entities['datatype'] in ['anat', 'dwi', 'fmap', 'func', 'perf']:
                 total += 1
@@ -208,9 +223,9 @@ class cobidas:
         total = 0
 
         # logic for this guideline
-        for nifti_file in self.layout.get(extension='nii.gz'):
-            metadata = nifti_file.get_metadata()
-            entities = nifti_file.get_entities()
+        for nifti_file in self.snapshot.records:
+            metadata = nifti_file.metadata
+            entities = nifti_file.entities
 
             if entities['datatype'] in ['anat', 'dwi', 'fmap', 'func', 'perf']:
                 total += 1
@@ -236,9 +251,9 @@ class cobidas:
         total = 0
         
         # logic for this guideline
-        for nifti_file in self.layout.get(datatype='fmap', extension='nii.gz'):
-            metadata = nifti_file.get_metadata()
-            entities = nifti_file.get_entities()
+        for nifti_file in self.snapshot.get(datatype='fmap'):
+            metadata = nifti_file.metadata
+            entities = nifti_file.entities
 
             if entities['suffix'] in ['magnitude1', 'magnitude2', 'phasediff', 'phase1', 'phase2']:
                 total += 1
@@ -264,20 +279,15 @@ class cobidas:
         total = 0
 
         # logic for this guideline
-        for nifti_file in self.layout.get(datatype='dwi', extension='nii.gz'):
-            metadata = nifti_file.get_metadata()
-            entities = nifti_file.get_entities()
-
-            bval_entities = deepcopy(entities)
-            bval_entities['extension'] = '.bval'
-            bval = Path(self.layout.build_path(bval_entities))
-
-            bvec_entities = deepcopy(entities)
-            bvec_entities['extension'] = '.bvec'
-            bvec = Path(self.layout.build_path(bval_entities))
+        for nifti_file in self.snapshot.get(datatype='dwi'):
+            # .bval and .bvec files sit next to the image and share its name
+            stem = nifti_file.filename[:-len('.nii.gz')]
+            bval = Path(nifti_file.directory) / (stem + '.bval')
+            bvec = Path(nifti_file.directory) / (stem + '.bvec')
 
+            # annexed files count as existing, even when their content has not been retrieved
             total += 1
-            if bval.exists() and bvec.exists():
+            if self.annex.available(bval) and self.annex.available(bvec):
                 tally += 1
 
         return {
@@ -299,8 +309,8 @@ class cobidas:
         total = 0
         
         # logic for this guideline
-        for nifti_file in self.layout.get(datatype='perf', extension='nii.gz'):
-            metadata = nifti_file.get_metadata()
+        for nifti_file in self.snapshot.get(datatype='perf'):
+            metadata = nifti_file.metadata
 
             total += 1
             if 'ArterialSpinLabelingType' in metadata and metadata['ArterialSpinLabelingType'] in ["CASL", "PCASL", "PASL"]:
@@ -325,8 +335,8 @@ class cobidas:
         total = 0
         
         # logic for this guideline
-        for nifti_file in self.layout.get(datatype='perf', extension='nii.gz'):
-            metadata = nifti_file.get_metadata()
+        for nifti_file in self.snapshot.get(datatype='perf'):
+            metadata = nifti_file.metadata
 
             total += 1
             if 'BackgroundSuppression' in metadata:
@@ -360,8 +370,8 @@ class cobidas:
         total = 0
         
         # logic for this guideline
-        for nifti_file in self.layout.get(datatype='perf', extension='nii.gz'):
-            metadata = nifti_file.get_metadata()
+        for nifti_file in self.snapshot.get(datatype='perf'):
+            metadata = nifti_file.metadata
 
             if 'ArterialSpinLabelingType' in metadata and metadata['ArterialSpinLabelingType'] in ["CASL", "PCASL"]:
                 total += 1
@@ -387,8 +397,8 @@ class cobidas:
         total = 0
 
         # logic for this guideline
-        for nifti_file in self.layout.get(datatype='perf', extension='nii.gz'):
-            metadata = nifti_file.get_metadata()
+        for nifti_file in self.snapshot.get(datatype='perf'):
+            metadata = nifti_file.metadata
 
             if 'ArterialSpinLabelingType' in metadata and metadata['ArterialSpinLabelingType'] in ["CASL", "PCASL"]:
                 total += 1
@@ -414,8 +424,8 @@ class cobidas:
         total = 0
         
         # logic for this guideline
-        for nifti_file in self.layout.get(datatype='perf', extension='nii.gz'):
-            metadata = nifti_file.get_metadata()
+        for nifti_file in self.snapshot.get(datatype='perf'):
+            metadata = nifti_file.metadata
 
             if 'ArterialSpinLabelingType' in metadata and metadata['ArterialSpinLabelingType'] == "PCASL":
                 total += 1
@@ -441,8 +451,8 @@ class cobidas:
         total = 0
 
         # logic for this guideline
-        for nifti_file in self.layout.get(datatype='perf', extension='nii.gz'):
-            metadata = nifti_file.get_metadata()
+        for nifti_file in self.snapshot.get(datatype='perf'):
+            metadata = nifti_file.metadata
 
             if 'ArterialSpinLabelingType' in metadata and metadata['ArterialSpinLabelingType'] == "PCASL":
                 total += 1
@@ -468,8 +478,8 @@ class cobidas:
         total = 0
         
         # logic for this guideline
-        for nifti_file in self.layout.get(datatype='perf', extension='nii.gz'):
-            metadata = nifti_file.get_metadata()
+        for nifti_file in self.snapshot.get(datatype='perf'):
+            metadata = nifti_file.metadata
             
             if 'ArterialSpinLabelingType' in metadata and metadata['ArterialSpinLabelingType'] == "CASL":
                 total += 1
@@ -495,8 +505,8 @@ class cobidas:
         total = 0
         
         # logic for this guideline
-        for nifti_file in self.layout.get(datatype='perf', extension='nii.gz'):
-            metadata = nifti_file.get_metadata()
+        for nifti_file in self.snapshot.get(datatype='perf'):
+            metadata = nifti_file.metadata
 
             if 'ArterialSpinLabelingType' in metadata and metadata['ArterialSpinLabelingType'] == "PASL":
                 total += 1
@@ -522,8 +532,8 @@ class cobidas:
         total = 0
         
         # logic for this guideline
-        for nifti_file in self.layout.get(datatype='perf', extension='nii.gz'):
-            metadata = nifti_file.get_metadata()
+        for nifti_file in self.snapshot.get(datatype='perf'):
+            metadata = nifti_file.metadata
 
             if 'ArterialSpinLabelingType' in metadata and metadata['ArterialSpinLabelingType'] == "PASL":
                 if 'BolusCutOffFlag' in metadata and metadata['BolusCutOffFlag']:
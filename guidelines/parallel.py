@@ -0,0 +1,117 @@
+# evaluate every guideline of a guidelines class over one dataset, optionally in worker processes
+
+import gc
+import inspect
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from guidelines.snapshot import metadata_snapshot
+
+# chunks per worker, so a slow chunk does not leave the other workers idle
+CHUNKS_PER_JOB = 4
+
+# the dataset's image files and a checker for them, set up once in each worker process
+_worker_files = None
+_worker_checker = None
+
+def guideline_checks(checker):
+    """
+    Return the (name, method) pairs of the guideline checks of a guidelines class instance.
+    """
+
+    return [
+        (name, func)
+        for name, func in inspect.getmembers(checker, predicate=inspect.ismethod)
+        if not name.startswith('_')
+    ]
+
+def evaluate_checks(checker):
+    """
+    Run every guideline check of a guidelines class instance on its snapshot.
+    Returns a dict of results and a dict of error messages, both keyed by check name.
+    """
+
+    results = {}
+    errors = {}
+    for name, func in guideline_checks(checker):
+        try:
+            results[name] = func()
+        except Exception as e:
+            errors[name] = str(e)
+
+    return results, errors
+
+def merge_results(guidelines_class, results):
+    """
+    Combine results of one guideline checked on separate chunks of the dataset.
+    Tallies and totals are summed, so chunks can be merged in any grouping.
+    """
+
+    tally = sum(result['tally'] for result in results)
+    total = sum(result['total'] for result in results)
+
+    return {
+        'tally': tally,
+        'total': total,
+        'status': guidelines_class._grade_success(tally, total),
+        'success_rate': guidelines_class._measure_success(tally, total),
+    }
+
+def _init_worker(guidelines_class, bids_files):
+    global _worker_files, _worker_checker
+    _worker_files = bids_files
+    _worker_checker = guidelines_class(snapshot=metadata_snapshot())
+
+def _evaluate_range(start, stop):
+    # reading entities and metadata is the slow part, so each worker reads its own chunk
+    _worker_checker.snapshot = metadata_snapshot.from_files(_worker_files[start:stop])
+    return evaluate_checks(_worker_checker)
+
+def evaluate(guidelines_class, layout, jobs=1):
+    """
+    Run every guideline check on the .nii.gz images of a BIDS layout, splitting them across jobs worker processes.
+    Each worker reads the metadata of its own chunks and checks them,
+    and the partial results are merged into the same tallies and totals as a serial run.
+    """
+
+    # workers inherit the layout by forking, so without fork the dataset is checked in this process
+    if jobs <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        return evaluate_checks(guidelines_class(layout))
+
+    # the same images metadata_snapshot.from_layout() reads for a serial run
+    bids_files = layout.get(extension='nii.gz')
+    if len(bids_files) < 2:
+        return evaluate_checks(guidelines_class(layout))
+
+    size = max(1, -(-len(bids_files) // (jobs * CHUNKS_PER_JOB)))
+    starts = range(0, len(bids_files), size)
+    stops = [min(start + size, len(bids_files)) for start in starts]
+
+    # keep the garbage collector in the workers from touching, and so copying, every inherited object
+    gc.freeze()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=_init_worker,
+            initargs=(guidelines_class, bids_files),
+        ) as executor:
+            partials = list(executor.map(_evaluate_range, starts, stops))
+    finally:
+        gc.unfreeze()
+
+    # a check that failed on any chunk is reported as failed for the whole dataset
+    errors = {}
+    for _, chunk_errors in partials:
+        for name, error in chunk_errors.items():
+            errors.setdefault(name, error)
+
+    names = set()
+    for chunk_results, chunk_errors in partials:
+        names.update(chunk_results, chunk_errors)
+
+    results = {}
+    for name in sorted(names - errors.keys()):
+        results[name] = merge_results(guidelines_class, [chunk_results[name] for chunk_results, _ in partials])
+
+    return results, errors
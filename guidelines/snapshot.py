@@ -0,0 +1,160 @@
+# a compact, read-only snapshot of per-file entities and metadata for guideline checks
+
+import hashlib
+import json
+import os
+import sys
+
+def _intern(value):
+    """
+    Intern strings so repeated keys and values like 'RepetitionTime' or 'func' are stored once.
+    """
+
+    if isinstance(value, str):
+        return sys.intern(value)
+    elif isinstance(value, list):
+        return [_intern(item) for item in value]
+    elif isinstance(value, dict):
+        return {_intern(key): _intern(item) for key, item in value.items()}
+    else:
+        return value
+
+class file_record:
+    """
+    One image file: its directory, file name, entity values, and a shared metadata dict.
+    Entity names live in a tuple shared by every file with the same set of entities.
+    """
+
+    __slots__ = ('directory', 'filename', 'entity_keys', 'entity_values', 'metadata')
+
+    def __init__(self, directory, filename, entity_keys, entity_values, metadata):
+        self.directory = directory
+        self.filename = filename
+        self.entity_keys = entity_keys
+        self.entity_values = entity_values
+        self.metadata = metadata
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, self.filename)
+
+    @property
+    def entities(self):
+        return dict(zip(self.entity_keys, self.entity_values))
+
+    def get(self, entity, default=None):
+        """
+        Look up a single entity value without building the entities dict.
+        """
+
+        try:
+            return self.entity_values[self.entity_keys.index(entity)]
+        except ValueError:
+            return default
+
+class metadata_snapshot:
+    def __init__(self):
+        self.records = []
+
+        # identical sidecar metadata is stored once and shared between files
+        self.metadata_table = []
+        self._metadata_lookup = {}
+
+        # one tuple of entity names per distinct set of entities
+        self._entity_keys = {}
+
+        # one object per distinct metadata value, e.g. an EchoTime or SliceTiming list
+        self._values = {}
+
+    @classmethod
+    def from_layout(cls, layout, extension='nii.gz'):
+        """
+        Build a snapshot of every file with the given extension in a BIDS layout.
+        """
+
+        return cls.from_files(layout.get(extension=extension))
+
+    @classmethod
+    def from_files(cls, bids_files):
+        """
+        Build a snapshot of a list of BIDS files, e.g. one chunk of a layout.
+        """
+
+        snapshot = cls()
+        for bids_file in bids_files:
+            snapshot.add(bids_file.path, bids_file.get_entities(), bids_file.get_metadata())
+
+        return snapshot
+
+    def add(self, path, entities, metadata):
+        """
+        Add one file, sharing its entity names and metadata with files already in the snapshot.
+        """
+
+        directory, filename = os.path.split(path)
+
+        keys = tuple(sys.intern(key) for key in entities)
+        keys = self._entity_keys.setdefault(keys, keys)
+        values = tuple(_intern(entities[key]) for key in keys)
+
+        record = file_record(sys.intern(directory), filename, keys, values, self._shared_metadata(metadata))
+        self.records.append(record)
+
+        return record
+
+    def _shared_metadata(self, metadata):
+        """
+        Return the stored copy of metadata equal to this one, storing it on first sight.
+        """
+
+        # keyed on a fixed-size digest, so distinct sidecars do not also keep their full JSON text
+        lookup_key = hashlib.blake2b(
+            json.dumps(metadata, sort_keys=True, default=str).encode('utf-8'), digest_size=16
+        ).digest()
+
+        if lookup_key not in self._metadata_lookup:
+            self._metadata_lookup[lookup_key] = len(self.metadata_table)
+            self.metadata_table.append(self._shared_value(dict(metadata)))
+
+        return self.metadata_table[self._metadata_lookup[lookup_key]]
+
+    def _shared_value(self, value):
+        """
+        Return the stored object equal to value, so values repeated across sidecars are kept once
+        even when each file has its own sidecar.
+        """
+
+        if isinstance(value, str):
+            return sys.intern(value)
+        elif isinstance(value, dict):
+            return {sys.intern(key): self._shared_value(item) for key, item in value.items()}
+        elif isinstance(value, list):
+            # items are shared objects already, so equal lists have items with equal ids
+            value = [self._shared_value(item) for item in value]
+            lookup_key = (list, tuple(id(item) for item in value))
+        else:
+            # the type keeps True, 1 and 1.0 apart
+            lookup_key = (type(value), value)
+
+        try:
+            return self._values.setdefault(lookup_key, value)
+        except TypeError:
+            return value
+
+    def get(self, **filters):
+        """
+        Return the records whose entities match every filter.
+        A filter value can be a single value or a list of accepted values.
+        """
+
+        records = self.records
+        for entity, accepted in filters.items():
+            if not isinstance(accepted, (list, tuple, set)):
+                accepted = [accepted]
+
+            records = [record for record in records if record.get(entity) in accepted]
+
+        return records
+
+    def __len__(self):
+        return len(self.records)
@@ -3,12 +3,13 @@
 # For checking BIDS directories against established guidelines, like COBIDAS.
 
 import argparse
-import inspect
 import tomllib
 import yaml
 
 from bids import BIDSLayout
+from guidelines.annex import annex_index
 from guidelines.guidelines import cobidas
+from guidelines.parallel import evaluate
 from pathlib import Path
 
 def percent_string(value):
@@ -40,6 +41,10 @@ def cli():
         choices=['COBIDAS', 'CLAIM', 'CRED-nf'],
         help='Guidelines to check against. Default is COBIDAS.',
     )
+    parser.add_argument(
+        '-j', '--jobs', metavar='N', type=int, default=1,
+        help='Number of worker processes to split each dataset across. Default is 1.',
+    )
     parser.add_argument(
         '-v', '--version', action='version', version=version,
         help='Show the version of the BIDS Guidelines App CLI and quit.',
@@ -49,20 +54,23 @@ def cli():
 
 def main():
     args = cli()
-    # bids_dir = args.bids_directory
-    # for bids_dir in sorted(Path("/data/openneuro/20250530_openneuro_clone").glob("ds004869/")):
-    for bids_dir in sorted(Path("/data/openneuro/20250530_openneuro_clone").glob("ds*/")):
-    # for bids_dir in Path("C:\\Users\\earlea\\OneDrive - National Institutes of Health\\Desktop\\repo\\bids-examples").glob("*/"):
 
-        if bids_dir.name.startswith('.') or bids_dir.name.startswith('docs') or bids_dir.name.startswith('tools'):
-            continue
+    if not args.bids_directory.exists():
+        raise FileNotFoundError(f"Error: The specified BIDS directory '{args.bids_directory}' does not exist.")
 
-        if not bids_dir.exists():
-            raise FileNotFoundError(f"Error: The specified BIDS directory '{bids_dir}' does not exist.")
+    if not args.bids_directory.is_dir():
+        raise ValueError(f"Error: The specified path '{args.bids_directory}' is not a directory.")
 
-        if not bids_dir.is_dir():
-            raise ValueError(f"Error: The specified path '{bids_dir}' is not a directory.")
+    # a single dataset, or a directory of datasets (like an OpenNeuro clone or bids-examples)
+    if annex_index().available(args.bids_directory / 'dataset_description.json'):
+        bids_dirs = [args.bids_directory]
+    else:
+        bids_dirs = [
+            bids_dir for bids_dir in sorted(args.bids_directory.glob('*/'))
+            if not (bids_dir.name.startswith('.') or bids_dir.name.startswith('docs') or bids_dir.name.startswith('tools'))
+        ]
 
+    for bids_dir in bids_dirs:
         print(f"Using {args.guidelines} guidelines to check BIDS dataset: {bids_dir}")
         try:
             layout = BIDSLayout(bids_dir, derivatives=False)
@@ -71,8 +79,8 @@ def main():
             continue
 
         if args.guidelines == 'COBIDAS':
-            # Initialize the cobidas class with the BIDS layout
-            checker = cobidas(layout)
+            # evaluate() is handed the class, and builds the checkers for the layout itself
+            guidelines_class = cobidas
             guidelines_content = yaml.safe_load(
                 (Path(__file__).parent / 'guidelines/cobidas.yaml').read_text(encoding='utf-8')
             )
@@ -83,30 +91,28 @@ def main():
         elif args.guidelines == 'CRED-nf':
             raise ValueError("CRED-nf guidelines are not yet implemented.")
 
-        # Here you would implement the logic to check the BIDS directory
-        guideline_functions = inspect.getmembers(checker, predicate=inspect.ismethod)
+        # read the metadata and run every guideline check over chunks of the dataset's files
+        results, errors = evaluate(guidelines_class, layout, jobs=args.jobs)
+
         guidelines_score = 0.0
         guidelines_evaluated = 0.0
 
-        # Iterate through the guideline functions and execute them
-        for name, func in guideline_functions:
-            if name.startswith('_'):
+        # Iterate through the guideline results
+        for name in sorted(results.keys() | errors.keys()):
+            if name in errors:
+                print(f"Error running check {name}: {errors[name]}")
                 continue
 
-            index = func.__name__.replace('_', '.')
-
-            try:
-                result = func()
-                if result['status'] == 'not applicable':
-                    continue
-                else:
-                    guidelines_score += result['success_rate']
-                    guidelines_evaluated += 1.0
+            index = name.replace('_', '.')
+            result = results[name]
 
-                    print(f"{index}:\t{result['tally']}/{result['total']}\t({percent_string(result['success_rate'])})\t{guidelines_content['guidelines'][index]['info']}")
+            if result['status'] == 'not applicable':
+                continue
+            else:
+                guidelines_score += result['success_rate']
+                guidelines_evaluated += 1.0
 
-            except Exception as e:
-                print(f"Error running check {name}: {e}")
+                print(f"{index}:\t{result['tally']}/{result['total']}\t({percent_string(result['success_rate'])})\t{guidelines_content['guidelines'][index]['info']}")
 
         # all done!
         score = percent_string( guidelines_score / guidelines_evaluated ) if guidelines_evaluated > 0 else "Not Applicable"